@@ -0,0 +1,74 @@
+"""
+Speed and output benchmark of the HTML extractors on the saved page fixtures.
+
+Run from the repository root:
+
+    python web-scrape-recipe/bench_extractors.py --repeat 50
+
+The fixtures in web-scrape-recipe/fixtures/ are hand-built copies of the
+MyPlate markup the scraper reads (recipe article, nutrition panel, listing
+cards) wrapped in a full page of navigation, scripts and footer. Every
+extractor must give exactly the same output as "html.parser", the way the
+scraper originally parsed pages.
+"""
+import argparse
+import os
+import time
+
+from extractors import EXTRACTORS, get_extractor
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+BASE_URL = "https://www.myplate.gov"
+
+def load_fixtures():
+    fixtures = {}
+    for file_name in sorted(os.listdir(FIXTURES_DIR)):
+        if file_name.endswith(".html"):
+            with open(os.path.join(FIXTURES_DIR, file_name), "rb") as f:
+                fixtures[file_name] = f.read()
+    return fixtures
+
+def extract(extractor, file_name, content):
+    if file_name.startswith("listing"):
+        return extractor.parse_listing(content, BASE_URL)
+    return extractor.parse_recipe(content)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="how many times each fixture is parsed")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    reference = get_extractor("html.parser")
+    expected = {file_name: extract(reference, file_name, content) for file_name, content in fixtures.items()}
+
+    baseline = None
+    mismatches = 0
+    for name in EXTRACTORS:
+        try:
+            extractor = get_extractor(name)
+        except ImportError as error:
+            print(f"{name:22} skipped: {error}")
+            continue
+
+        different = [
+            file_name for file_name, content in fixtures.items()
+            if extract(extractor, file_name, content) != expected[file_name]
+        ]
+        mismatches += len(different)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for file_name, content in fixtures.items():
+                extract(extractor, file_name, content)
+        per_page = (time.perf_counter() - start) / (args.repeat * len(fixtures))
+        baseline = baseline or per_page
+
+        status = "identical output" if not different else f"DIFFERENT output on {', '.join(different)}"
+        print(f"{name:22} {per_page * 1000:7.2f} ms/page  {baseline / per_page:5.1f}x  {status}")
+
+    if mismatches:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+End-to-end scrape benchmark against a local stand-in for MyPlate.
+
+Run from where the scraper runs, since diet.py reads its lexicons from data/:
+
+    python web-scrape-recipe/bench_scrape.py --pages 5 --latency 20
+
+A local HTTP server serves the saved fixtures in web-scrape-recipe/fixtures/:
+`--pages` listing pages of 100 recipes each, then recipe pages that all have a
+nutrition table, so the browser fallback is never started. `--latency` adds a
+fixed delay to every response to stand in for the network. The full scrape
+(listing crawl, then the recipe pipeline) runs against it with a fresh
+manifest and store in a temporary directory, and the per-stage metrics are
+printed and optionally exported.
+
+To catch throughput regressions, save a baseline once and compare later runs:
+
+    python web-scrape-recipe/bench_scrape.py --save-baseline bench_baseline.json
+    python web-scrape-recipe/bench_scrape.py --baseline bench_baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def read_fixture(file_name):
+    with open(os.path.join(FIXTURES_DIR, file_name), "rb") as f:
+        return f.read()
+
+class FixtureServer(ThreadingHTTPServer):
+    """Serve MyPlate-like listing and recipe pages from the fixtures."""
+
+    daemon_threads = True
+    # The default backlog of 5 drops connections under a concurrent crawl
+    request_queue_size = 128
+
+    def __init__(self, pages, latency):
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.pages = pages
+        self.latency = latency
+        self.listing_page = read_fixture("listing_page.html")
+        self.last_listing_page = read_fixture("listing_last_page.html")
+        self.recipe_pages = [
+            read_fixture(file_name) for file_name in sorted(os.listdir(FIXTURES_DIR))
+            if file_name.startswith("recipe_") and "no_nutrition" not in file_name
+        ]
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the fetcher's connection pool is exercised like in production
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        url = urlsplit(self.path)
+
+        if url.path == "/myplate-kitchen/recipes":
+            page = int(parse_qs(url.query).get("page", ["0"])[0])
+            if page < server.pages:
+                # Every listing page links to its own set of recipes
+                body = re.sub(rb"/recipes/myplate-kitchen/recipe-", f"/recipes/myplate-kitchen/page-{page}-recipe-".encode(), server.listing_page)
+            else:
+                body = server.last_listing_page
+        elif url.path.startswith("/recipes/myplate-kitchen/"):
+            body = server.recipe_pages[zlib.crc32(url.path.encode()) % len(server.recipe_pages)]
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def write_category_files(data_dir, recipe_links):
+    """Spread the recipes over a few categories so the category lookup has work to do."""
+    categories = {"courses": ["Breakfast", "Main Dishes"], "food_groups": ["Vegetables", "Protein Foods"], "cuisines": ["Asian&Pacific_Islander"]}
+    for category_type, names in categories.items():
+        os.makedirs(os.path.join(data_dir, category_type), exist_ok=True)
+        for number, name in enumerate(names):
+            with open(os.path.join(data_dir, category_type, f"{name}.txt"), "w") as f:
+                f.write("\n".join(recipe_links[number::len(names) + 1]) + "\n")
+
+def run_benchmark(args):
+    from category_index import load_category_index
+    from fetcher import Fetcher
+    from manifest import CrawlManifest
+    from metrics import metrics
+    from myplate_scrape import get_recipe_links
+    from nutrition import NutritionExtractor
+    from pipeline import RecipePipeline
+    from recipe_store import RecipeStore
+
+    server = FixtureServer(args.pages, args.latency / 1000).start()
+    metrics.reset()
+    with tempfile.TemporaryDirectory() as data_dir:
+        fetcher = Fetcher(concurrency=args.concurrency, requests_per_second=0)
+        manifest = CrawlManifest(os.path.join(data_dir, "crawl_manifest.jsonl"))
+        store = RecipeStore(os.path.join(data_dir, "recipes.db"))
+        nutrition_extractor = NutritionExtractor()
+        try:
+            start = time.perf_counter()
+            recipe_links = get_recipe_links(f"{server.base_url}/myplate-kitchen/recipes?page=", fetcher, server.base_url)
+            write_category_files(data_dir, recipe_links)
+            category_index = load_category_index(data_dir, os.path.join(data_dir, "category_index.json"))
+
+            pipeline = RecipePipeline(fetcher, category_index, nutrition_extractor, manifest, store, workers=args.workers)
+            pipeline.run(recipe_links)
+            elapsed = time.perf_counter() - start
+            saved = len(store)
+        finally:
+            nutrition_extractor.close()
+            store.close()
+            manifest.close()
+            fetcher.close()
+            server.shutdown()
+
+    result = {
+        "recipes": saved,
+        "seconds": elapsed,
+        "recipes_per_second": saved / elapsed,
+        "settings": {"pages": args.pages, "latency_ms": args.latency, "concurrency": args.concurrency, "workers": args.workers},
+        "metrics": metrics.to_dict(),
+    }
+    return result, metrics.report()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=5, help="listing pages of 100 recipes to serve")
+    parser.add_argument("--latency", type=float, default=0, help="delay added to every response, in milliseconds")
+    parser.add_argument("--concurrency", type=int, default=16, help="fetcher concurrency")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes, one per core by default")
+    parser.add_argument("--output", help="write the result and every stage's metrics to this JSON file")
+    parser.add_argument("--save-baseline", help="save the result as the baseline for later runs")
+    parser.add_argument("--baseline", help="fail when throughput drops below this saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop against the baseline")
+    args = parser.parse_args()
+
+    result, report = run_benchmark(args)
+    print(report)
+    print(f"Scraped {result['recipes']} recipes in {result['seconds']:.2f} s ({result['recipes_per_second']:.1f} recipes/s)")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline["settings"] != result["settings"]:
+            print(f"Warning: baseline was run with different settings: {baseline['settings']}")
+        minimum = baseline["recipes_per_second"] * (1 - args.tolerance)
+        if result["recipes_per_second"] < minimum:
+            print(f"REGRESSION: {result['recipes_per_second']:.1f} recipes/s is below {minimum:.1f} "
+                  f"(baseline {baseline['recipes_per_second']:.1f} - {args.tolerance:.0%})")
+            raise SystemExit(1)
+        print(f"Throughput is within {args.tolerance:.0%} of the baseline ({baseline['recipes_per_second']:.1f} recipes/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Latency and recall benchmark for the ingredient similarity index.
+
+Run from the repository root, against the scraped recipes:
+
+    python web-scrape-recipe/bench_similarity.py
+
+or against a synthetic corpus built from the ingredient lists in data/:
+
+    python web-scrape-recipe/bench_similarity.py --synthetic 5000
+
+Recall is measured against an exact brute-force cosine search with fresh IDF
+weights, so it shows what the incremental updates (and their IDF snapshot)
+cost in quality.
+"""
+import argparse
+import math
+import random
+import time
+
+from similarity_index import build_similarity_index, ingredient_tokens
+
+DIETS = ["gluten_free", "vegetarian", "vegan", "pescetarian", "dairy_free", "seafood_free", "nut_free"]
+
+def synthetic_recipes(count, seed=0):
+    """Make up recipes from the ingredient lists in data/, with random diet tags."""
+    words = []
+    for file_name in ["fruits", "grains", "meats", "dairy", "egg", "gluten"]:
+        with open(f"data/{file_name}.txt", "r") as f:
+            words.extend(line.strip() for line in f.read().splitlines() if line.strip())
+
+    rng = random.Random(seed)
+    # A skewed vocabulary, like real recipes where a few staples are everywhere
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return [
+        {
+            "recipe_url": f"synthetic/{number}",
+            "ingredients": [f"1 cup {word}" for word in rng.choices(words, weights, k=rng.randint(4, 14))],
+            "diets": [diet for diet in DIETS if rng.random() < 0.5],
+        }
+        for number in range(count)
+    ]
+
+def stored_recipes():
+    from recipe_store import RecipeStore
+
+    with RecipeStore() as store:
+        return list(store.iter_recipes())
+
+def brute_force(recipes, query, top_k, diets):
+    """Exact top-k by comparing the query with every recipe, using fresh IDF weights."""
+    token_counts = {recipe["recipe_url"]: ingredient_tokens(recipe["ingredients"]) for recipe in recipes}
+    document_frequency = {}
+    for tokens in token_counts.values():
+        for token in tokens:
+            document_frequency[token] = document_frequency.get(token, 0) + 1
+
+    def vector(tokens):
+        idf = lambda token: math.log((1 + len(recipes)) / (1 + document_frequency.get(token, 0))) + 1
+        return {token: (1 + math.log(count)) * idf(token) for token, count in tokens.items()}
+
+    def cosine(a, b):
+        dot = sum(weight * b.get(token, 0.0) for token, weight in a.items())
+        norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+        return dot / norm if norm else 0.0
+
+    query_vector = vector(token_counts[query])
+    by_url = {recipe["recipe_url"]: recipe for recipe in recipes}
+    scores = [
+        (cosine(query_vector, vector(tokens)), recipe_url)
+        for recipe_url, tokens in token_counts.items()
+        if recipe_url != query and set(diets) <= set(by_url[recipe_url]["diets"])
+    ]
+    return [recipe_url for score, recipe_url in sorted(scores, reverse=True)[:top_k] if score > 0]
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, help="benchmark on this many synthetic recipes instead of data/recipes.db")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--recall-queries", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--incremental", type=float, default=0.2, help="share of the corpus added one recipe at a time")
+    args = parser.parse_args()
+
+    recipes = synthetic_recipes(args.synthetic) if args.synthetic else stored_recipes()
+    rng = random.Random(1)
+    split = int(len(recipes) * (1 - args.incremental))
+
+    start = time.perf_counter()
+    index = build_similarity_index(recipes[:split])
+    print(f"Built index over {split} recipes in {time.perf_counter() - start:.3f} s")
+
+    add_times = []
+    for recipe in recipes[split:]:
+        start = time.perf_counter()
+        index.add(recipe)
+        add_times.append(time.perf_counter() - start)
+    if add_times:
+        print(f"Added {len(add_times)} recipes incrementally: "
+              f"p50 {percentile(add_times, 0.5) * 1000:.2f} ms, max {max(add_times) * 1000:.2f} ms")
+
+    for diets in ([], ["vegan"]):
+        query_times = []
+        for recipe in rng.sample(recipes, min(args.queries, len(recipes))):
+            start = time.perf_counter()
+            index.similar(recipe["recipe_url"], args.top_k, diets)
+            query_times.append(time.perf_counter() - start)
+        print(f"Query latency (diets={diets}): p50 {percentile(query_times, 0.5) * 1000:.2f} ms, "
+              f"p95 {percentile(query_times, 0.95) * 1000:.2f} ms, p99 {percentile(query_times, 0.99) * 1000:.2f} ms")
+
+    hits = 0
+    total = 0
+    brute_force_times = []
+    for recipe in rng.sample(recipes, min(args.recall_queries, len(recipes))):
+        start = time.perf_counter()
+        expected = brute_force(recipes, recipe["recipe_url"], args.top_k, [])
+        brute_force_times.append(time.perf_counter() - start)
+        found = {recipe_url for recipe_url, _ in index.similar(recipe["recipe_url"], args.top_k)}
+        hits += len(found.intersection(expected))
+        total += len(expected)
+    if total:
+        print(f"Recall@{args.top_k} against brute force: {hits / total:.3f} "
+              f"(brute force p50 {percentile(brute_force_times, 0.5) * 1000:.1f} ms per query)")
+
+if __name__ == "__main__":
+    main()
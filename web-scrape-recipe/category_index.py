@@ -0,0 +1,81 @@
+import json
+import os
+
+CATEGORY_TYPES = ["courses", "food_groups", "cuisines"]
+
+class CategoryIndex:
+    """
+    Inverted index from recipe URL to the categories it is listed under.
+
+    `categories` holds the sorted category names of each type and `links` maps
+    each URL to one list of category ids per type, which keeps the saved index
+    small no matter how many recipes share a category.
+    """
+
+    def __init__(self, categories, links, sources):
+        self.categories = categories
+        self.links = links
+        self.sources = sources
+
+    def lookup(self, recipe_link):
+        """Return {category type: [category names]} for a recipe URL."""
+        ids_by_type = self.links.get(recipe_link)
+        if ids_by_type is None:
+            return {category_type: [] for category_type in CATEGORY_TYPES}
+        return {
+            category_type: [self.categories[category_type][category_id] for category_id in ids]
+            for category_type, ids in zip(CATEGORY_TYPES, ids_by_type)
+        }
+
+    def save(self, path):
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"sources": self.sources, "categories": self.categories, "links": self.links}, f, separators=(",", ":"))
+        os.replace(temp_path, path)
+
+def category_sources(data_dir="data"):
+    """Fingerprint the category link files by size and modification time."""
+    sources = {}
+    for category_type in CATEGORY_TYPES:
+        folder = os.path.join(data_dir, category_type)
+        for file_name in sorted(os.listdir(folder)):
+            if not file_name.endswith(".txt"):
+                continue
+            stat = os.stat(os.path.join(folder, file_name))
+            sources[f"{category_type}/{file_name}"] = [stat.st_size, stat.st_mtime_ns]
+    return sources
+
+def build_category_index(data_dir="data"):
+    """Read every category link file once and invert it into a CategoryIndex."""
+    sources = category_sources(data_dir)
+    categories = {}
+    links = {}
+    for type_id, category_type in enumerate(CATEGORY_TYPES):
+        folder = os.path.join(data_dir, category_type)
+        file_names = sorted(file_name for file_name in os.listdir(folder) if file_name.endswith(".txt"))
+        categories[category_type] = [file_name.replace(".txt", "") for file_name in file_names]
+
+        for category_id, file_name in enumerate(file_names):
+            with open(os.path.join(folder, file_name), "r") as f:
+                for recipe_link in set(f.read().splitlines()):
+                    if not recipe_link:
+                        continue
+                    ids_by_type = links.setdefault(recipe_link, [[] for _ in CATEGORY_TYPES])
+                    ids_by_type[type_id].append(category_id)
+    return CategoryIndex(categories, links, sources)
+
+def load_category_index(data_dir="data", path="data/category_index.json"):
+    """
+    Load the saved category index, rebuilding it when a category link file changed.
+    """
+    sources = category_sources(data_dir)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            saved = json.load(f)
+        if saved["sources"] == sources:
+            return CategoryIndex(saved["categories"], saved["links"], saved["sources"])
+
+    print("Category link files changed, rebuilding the category index...")
+    index = build_category_index(data_dir)
+    index.save(path)
+    return index
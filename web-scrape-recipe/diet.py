@@ -1,3 +1,5 @@
+import re
+
 # Utility function to read and return the contents of a file as a list
 def read_ingredients(file_path):
     with open(file_path, "r") as f:
@@ -11,31 +13,148 @@ dairy_products = read_ingredients("data/dairy.txt")
 gluten_products = read_ingredients("data/gluten.txt")
 nuts = read_ingredients("data/nut.txt")
 
+LEXICONS = {
+    "seafood": seafood,
+    "red_meat": red_meat,
+    "egg": egg_products,
+    "dairy": dairy_products,
+    "gluten": gluten_products,
+    "nut": nuts,
+}
+
+# Each diet lists the lexicons whose ingredients it does not allow
+DIETS = {
+    "gluten_free": ["gluten"],
+    "vegetarian": ["seafood", "red_meat"],
+    "vegan": ["seafood", "red_meat", "egg", "dairy"],
+    "pescetarian": ["red_meat", "dairy"],
+    "dairy_free": ["dairy"],
+    "seafood_free": ["seafood"],
+    "nut_free": ["nut"],
+}
+
 # General function to check if any ingredient from the list appears in the recipe ingredients
 def contains_ingredient(ingredients, abandon_ingredients):
     return any( abandon_ingredient in ingredient for abandon_ingredient in abandon_ingredients for ingredient in ingredients)
 
+def trie_pattern(terms):
+    """
+    Return a regex matching the longest of the terms at a position.
+
+    The terms are merged into a character trie (["egg", "eggs", "eel"] becomes
+    "e(?:gg(?:s)?|el)"), so the regex engine follows one branch per character
+    instead of trying every term in turn.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def node_pattern(node):
+        branches = [re.escape(char) + node_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 and len(node) == 1 else "(?:" + "|".join(branches) + ")"
+        # A term ending here still matches when no longer term does; the greedy `?` prefers the longer one
+        return group + "?" if "" in node else group
+
+    return node_pattern(trie)
+
+class DietClassifier:
+    """
+    Classify recipes against every diet in one scan of the ingredient text.
+
+    All lexicon terms are compiled into a single regex built from a trie of the
+    terms. The lookahead makes it report the longest term starting at every
+    position, and each term knows which shorter terms (from any lexicon) are
+    prefixes of it, so the result is the same as the substring checks in
+    `contains_ingredient`.
+    """
+
+    def __init__(self, lexicons, diets):
+        self.lexicons = lexicons
+        self.diets = diets
+
+        lexicon_sets = {name: set(terms) for name, terms in lexicons.items()}
+        # An empty line in a lexicon is a substring of everything
+        self.always_found = {name: "" for name, terms in lexicon_sets.items() if "" in terms}
+
+        terms = {term for terms in lexicon_sets.values() for term in terms if term}
+        self.term_lexicons = {}
+        for term in terms:
+            found = {}
+            # Longest prefix first so the reported term is the most specific one
+            for length in range(len(term), 0, -1):
+                prefix = term[:length]
+                for name, lexicon_terms in lexicon_sets.items():
+                    if name not in found and prefix in lexicon_terms:
+                        found[name] = prefix
+            self.term_lexicons[term] = found
+
+        if terms:
+            self.pattern = re.compile(f"(?=({trie_pattern(terms)}))")
+        else:
+            self.pattern = None
+
+    def find_lexicons(self, ingredients):
+        """Return {lexicon name: first matching term} for the given ingredients."""
+        found = dict(self.always_found)
+        if self.pattern is None or len(found) == len(self.lexicons):
+            return found
+
+        # Terms never contain a newline, so matches cannot span two ingredients
+        text = "\n".join(ingredient.lower() for ingredient in ingredients)
+        for match in self.pattern.finditer(text):
+            for name, term in self.term_lexicons[match.group(1)].items():
+                found.setdefault(name, term)
+            if len(found) == len(self.lexicons):
+                break
+        return found
+
+    def classify(self, ingredients):
+        """
+        Return (flags, matches) for the given ingredients.
+
+        flags maps each diet to whether the recipe follows it, matches maps each
+        diet to the ingredient term that ruled it out (None if the diet holds).
+        """
+        found = self.find_lexicons(ingredients)
+        flags = {}
+        matches = {}
+        for diet, excluded in self.diets.items():
+            term = next((found[name] for name in excluded if name in found), None)
+            flags[diet] = term is None
+            matches[diet] = term
+        return flags, matches
+
+diet_classifier = DietClassifier(LEXICONS, DIETS)
+
+def classify_diets(ingredients):
+    return diet_classifier.classify(ingredients)
+
 # Check functions
 def is_gluten_free(ingredients):
-    return not contains_ingredient([ingredient.lower() for ingredient in ingredients], gluten_products)
+    return classify_diets(ingredients)[0]["gluten_free"]
 
 def is_vegetarian(ingredients):
     # Vegetarian: No seafood or red meat
-    return not contains_ingredient([ingredient.lower() for ingredient in ingredients], seafood + red_meat)
+    return classify_diets(ingredients)[0]["vegetarian"]
 
 def is_vegan(ingredients):
     # Vegan: No animal products (seafood, red meat, eggs, dairy)
-    return not contains_ingredient([ingredient.lower() for ingredient in ingredients], seafood + red_meat + egg_products + dairy_products)
+    return classify_diets(ingredients)[0]["vegan"]
 
 def is_pescetarian(ingredients):
     # Pescetarian: No red meat or dairy, but seafood is allowed
-    return not contains_ingredient([ingredient.lower() for ingredient in ingredients], red_meat + dairy_products)
+    return classify_diets(ingredients)[0]["pescetarian"]
 
 def is_dairy_free(ingredients):
-    return not contains_ingredient([ingredient.lower() for ingredient in ingredients], dairy_products)
+    return classify_diets(ingredients)[0]["dairy_free"]
 
 def is_seafood_free(ingredients):
-    return not contains_ingredient([ingredient.lower() for ingredient in ingredients], seafood)
+    return classify_diets(ingredients)[0]["seafood_free"]
 
 def is_nut_free(ingredients):
-    return not contains_ingredient([ingredient.lower() for ingredient in ingredients], nuts)
\ No newline at end of file
+    return classify_diets(ingredients)[0]["nut_free"]
\ No newline at end of file
@@ -0,0 +1,174 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Class names of the parts of a MyPlate page the scraper reads
+RECIPE_ARTICLE_CLASS = "mp-recipe-full__article"
+NUTRITION_PANEL_CLASS = "panel-expanded"
+LISTING_CLASS = "view-content"
+
+def ingredient_text(text):
+    """Join the lines of an ingredient, which MyPlate splits into amount and name."""
+    return " ".join(item.strip() for item in text.strip().split("\n") if item.strip())
+
+def has_any_class(*class_names):
+    def match(value):
+        if value is None:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return any(class_name in classes for class_name in class_names)
+    return match
+
+def parse_nutrition_table(soup):
+    """Read the expanded nutrition table from parsed HTML into a {nutrient: value} dict."""
+    nutrition_info = {}
+    for row in soup.select(".panel.panel-expanded tbody tr"):
+        cells = row.find_all("td")
+
+        if len(cells) >= 2:
+            nutrient_name = cells[0].get_text().strip()
+            nutrient_value = cells[1].get_text().strip()
+            if nutrient_name and nutrient_value:
+                nutrition_info[nutrient_name] = nutrient_value
+    return nutrition_info
+
+class SoupExtractor:
+    """
+    Extract recipe pages and listing pages with BeautifulSoup.
+
+    Parameters:
+    - parser (str): The BeautifulSoup tree builder, "html.parser" or "lxml".
+    - strained (bool): Only build the tree for the parts of the page that are read
+      (the recipe article and nutrition panel, or the listing), skipping headers,
+      menus, scripts and footers.
+    """
+
+    def __init__(self, parser="html.parser", strained=True):
+        self.parser = parser
+        self.strained = strained
+
+    def soup(self, content, *class_names):
+        if self.strained:
+            return BeautifulSoup(content, self.parser, parse_only=SoupStrainer(class_=has_any_class(*class_names)))
+        return BeautifulSoup(content, self.parser)
+
+    def parse_listing(self, content, base_url):
+        """Return the recipe links on a listing page, or None past the last page."""
+        results = self.soup(content, LISTING_CLASS).find(class_=LISTING_CLASS)
+
+        if results is None:
+            return None
+        recipe_cards = results.find_all("div", class_="mp-recipe-teaser__title")
+
+        return [base_url + recipe_card.find("a")["href"] for recipe_card in recipe_cards]
+
+    def parse_recipe(self, content):
+        """
+        Return the fields of a recipe page, or None when it has no recipe article.
+
+        `nutrition_info` is empty when the nutrition table is not in the static HTML.
+        """
+        soup = self.soup(content, RECIPE_ARTICLE_CLASS, NUTRITION_PANEL_CLASS)
+        recipe_article = soup.find("article", class_=RECIPE_ARTICLE_CLASS)
+        if recipe_article is None:
+            return None
+
+        full_details = recipe_article.find("div", class_="mp-recipe-full__details") # include ingredients and instructions
+        return {
+            "title": recipe_article.find("h1", class_="mp-recipe-full__title").get_text().replace("\n", ""),
+            "servings": recipe_article.find("div", class_= "mp-recipe-full__overview").find_all("span", class_="mp-recipe-full__detail--data")[0].get_text().strip().split()[0],
+            "description": recipe_article.find("div", class_="mp-recipe-full__description").get_text().strip(),
+            "image_url": recipe_article.find("img", class_="image-style-recipe-525-x-350-")["src"],
+            "ingredients": [
+                ingredient_text(ingredient.get_text())
+                for ingredient in full_details.find("div", class_="field--name-field-ingredients").find_all("li")
+            ],
+            "instructions": [
+                instruction.get_text().strip()
+                for instruction in full_details.find("div", class_="field--name-field-instructions").find_all("li")
+            ],
+            "nutrition_info": parse_nutrition_table(soup),
+        }
+
+def class_xpath(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+class LxmlExtractor:
+    """
+    Extract recipe pages and listing pages with lxml and XPath, without BeautifulSoup.
+
+    Gives the same output as SoupExtractor at a fraction of the parse cost.
+    """
+
+    def __init__(self):
+        if lxml is None:
+            raise ImportError("The lxml extractor needs the lxml package")
+
+    def first(self, element, path):
+        found = element.xpath(path)
+        return found[0] if found else None
+
+    def parse_listing(self, content, base_url):
+        """Return the recipe links on a listing page, or None past the last page."""
+        results = self.first(lxml.html.fromstring(content), f"//*[{class_xpath(LISTING_CLASS)}]")
+
+        if results is None:
+            return None
+        recipe_cards = results.xpath(f".//div[{class_xpath('mp-recipe-teaser__title')}]")
+
+        return [base_url + self.first(recipe_card, ".//a").get("href") for recipe_card in recipe_cards]
+
+    def parse_nutrition_table(self, document):
+        nutrition_info = {}
+        rows = document.xpath(f"//*[{class_xpath('panel')} and {class_xpath(NUTRITION_PANEL_CLASS)}]//tbody//tr")
+        for row in rows:
+            cells = row.xpath(".//td")
+
+            if len(cells) >= 2:
+                nutrient_name = cells[0].text_content().strip()
+                nutrient_value = cells[1].text_content().strip()
+                if nutrient_name and nutrient_value:
+                    nutrition_info[nutrient_name] = nutrient_value
+        return nutrition_info
+
+    def parse_recipe(self, content):
+        """
+        Return the fields of a recipe page, or None when it has no recipe article.
+
+        `nutrition_info` is empty when the nutrition table is not in the static HTML.
+        """
+        document = lxml.html.fromstring(content)
+        recipe_article = self.first(document, f"//article[{class_xpath(RECIPE_ARTICLE_CLASS)}]")
+        if recipe_article is None:
+            return None
+
+        overview = self.first(recipe_article, f".//div[{class_xpath('mp-recipe-full__overview')}]")
+        full_details = self.first(recipe_article, f".//div[{class_xpath('mp-recipe-full__details')}]")
+        ingredients = self.first(full_details, f".//div[{class_xpath('field--name-field-ingredients')}]")
+        instructions = self.first(full_details, f".//div[{class_xpath('field--name-field-instructions')}]")
+        return {
+            "title": self.first(recipe_article, f".//h1[{class_xpath('mp-recipe-full__title')}]").text_content().replace("\n", ""),
+            "servings": overview.xpath(f".//span[{class_xpath('mp-recipe-full__detail--data')}]")[0].text_content().strip().split()[0],
+            "description": self.first(recipe_article, f".//div[{class_xpath('mp-recipe-full__description')}]").text_content().strip(),
+            "image_url": self.first(recipe_article, f".//img[{class_xpath('image-style-recipe-525-x-350-')}]").get("src"),
+            "ingredients": [ingredient_text(ingredient.text_content()) for ingredient in ingredients.xpath(".//li")],
+            "instructions": [instruction.text_content().strip() for instruction in instructions.xpath(".//li")],
+            "nutrition_info": self.parse_nutrition_table(document),
+        }
+
+EXTRACTORS = {
+    # What the scraper originally did: build the whole tree with the pure Python parser
+    "html.parser": lambda: SoupExtractor("html.parser", strained=False),
+    "html.parser-strained": lambda: SoupExtractor("html.parser", strained=True),
+    "lxml-soup-strained": lambda: SoupExtractor("lxml", strained=True),
+    "lxml": LxmlExtractor,
+}
+
+def get_extractor(name=None):
+    """Return the named extractor, or the fastest one available."""
+    if name is None:
+        name = "lxml" if lxml is not None else "html.parser-strained"
+    return EXTRACTORS[name]()
@@ -0,0 +1,142 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+
+# Status codes that are worth retrying, everything else is returned as is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class HostRateLimiter:
+    """Space out requests to a single host by at least `1 / requests_per_second` seconds."""
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        # Reserve a slot under the lock, then sleep outside of it
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class Fetcher:
+    """
+    Concurrent HTTP fetcher sharing one keep-alive connection pool.
+
+    Parameters:
+    - concurrency (int): The maximum number of requests in flight at once.
+    - requests_per_second (float): The rate limit applied to each host (0 disables it).
+    - retries (int): How many times a failed request is retried.
+    - backoff (float): The base delay in seconds, doubled on every retry and jittered.
+    - timeout (float): The timeout in seconds for a single request.
+    - session (requests.Session): An optional session to send the requests with. It is
+      used as is, so it should mount an adapter with a pool of at least `concurrency`
+      connections; by default a session with such a pool is created.
+    """
+
+    def __init__(self, concurrency=8, requests_per_second=4.0, retries=3, backoff=0.5, timeout=10, session=None):
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fetcher")
+        self.limiters = {}
+        self.limiters_lock = threading.Lock()
+
+    def limiter_for(self, url):
+        host = urlsplit(url).netloc
+        with self.limiters_lock:
+            if host not in self.limiters:
+                self.limiters[host] = HostRateLimiter(self.requests_per_second)
+            return self.limiters[host]
+
+    def retry_delay(self, attempt):
+        # Full jitter so that retrying workers do not hit the host in lockstep
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def get(self, url, stage="fetch", **kwargs):
+        """
+        GET a URL, retrying connection errors and retryable status codes.
+
+        The whole request, retries included, is timed under `stage` in the metrics.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        limiter = self.limiter_for(url)
+
+        with metrics.timer(stage):
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    metrics.count(stage, "retries")
+                limiter.wait()
+                try:
+                    response = self.session.get(url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.retries:
+                        metrics.count(stage, "failed")
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                        metrics.count(stage, f"status_{response.status_code}")
+                        return response
+                time.sleep(self.retry_delay(attempt))
+
+    def submit(self, url, **kwargs):
+        """Fetch a URL in the background and return its Future."""
+        return self.executor.submit(self.get, url, **kwargs)
+
+    def fetch_all(self, urls, headers_for=None, stage="fetch", **kwargs):
+        """
+        Fetch many URLs concurrently and yield (url, response) in input order.
+
+        At most twice the concurrency is kept in flight, so responses do not pile up
+        in memory when the caller is slower than the network. A URL that still fails
+        after all retries is yielded with a None response. `headers_for` can return
+        extra headers for each URL, e.g. for conditional requests.
+        """
+        pending = deque()
+        urls = iter(urls)
+
+        def fill():
+            while len(pending) < 2 * self.concurrency:
+                url = next(urls, None)
+                if url is None:
+                    return
+                headers = headers_for(url) if headers_for else None
+                pending.append((url, self.submit(url, stage=stage, headers=headers, **kwargs)))
+
+        fill()
+        while pending:
+            url, future = pending.popleft()
+            try:
+                response = future.result()
+            except requests.RequestException as error:
+                print(f"Could not fetch {url}: {error}")
+                response = None
+            fill()
+            yield url, response
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+# Statuses a recipe can end up with after a crawl
+OK = "ok"
+SKIPPED = "skipped"
+NUTRITION_MISSING = "nutrition-missing"
+ERROR = "error"
+
+# Recipes crawled more recently than this are not fetched again, which is
+# what lets a crashed nightly refresh resume instead of starting over
+DEFAULT_MAX_AGE = timedelta(hours=20)
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+class CrawlManifest:
+    """
+    On-disk record of every recipe page the crawler has fetched.
+
+    Each entry holds the URL, when it was last fetched, the ETag/Last-Modified
+    validators, a hash of the page content and the status of the crawl. Entries
+    are appended to a JSON lines file as soon as a recipe is done, so a crashed
+    run can pick up where it stopped; the latest line for a URL wins and the
+    file is compacted on load.
+    """
+
+    def __init__(self, path="data/crawl_manifest.jsonl"):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+        self.file = open(self.path, "a")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+
+        line_count = 0
+        with open(self.path, "r") as f:
+            for line in f:
+                line_count += 1
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave the last line half written
+                    continue
+                self.entries[entry["url"]] = entry
+
+        if line_count > 2 * len(self.entries):
+            self.compact()
+
+    def compact(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(temp_path, self.path)
+
+    def get(self, url):
+        return self.entries.get(url)
+
+    def is_fresh(self, url, max_age):
+        """Whether the URL was crawled successfully less than `max_age` (a timedelta) ago."""
+        entry = self.entries.get(url)
+        if entry is None or entry["status"] == ERROR:
+            return False
+        fetched_at = datetime.fromisoformat(entry["fetched_at"])
+        return datetime.now(timezone.utc) - fetched_at < max_age
+
+    def conditional_headers(self, url):
+        """Return the If-None-Match/If-Modified-Since headers for a URL that was crawled before."""
+        entry = self.entries.get(url)
+        headers = {}
+        if entry is None or entry["status"] not in (OK, SKIPPED):
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, url, page):
+        """Whether a fetched page is the same as the one already saved for the URL."""
+        entry = self.entries.get(url)
+        if entry is None or entry["status"] not in (OK, SKIPPED):
+            return False
+        return page.status_code == 304 or entry.get("content_hash") == content_hash(page.content)
+
+    def record(self, url, status, page=None):
+        """Save the outcome of crawling a URL and append it to the manifest file."""
+        entry = dict(self.entries.get(url, {"url": url}))
+        entry["fetched_at"] = datetime.now(timezone.utc).isoformat()
+        entry["status"] = status
+
+        if status in (OK, NUTRITION_MISSING) and page is not None:
+            entry["etag"] = page.headers.get("ETag")
+            entry["last_modified"] = page.headers.get("Last-Modified")
+            entry["content_hash"] = content_hash(page.content)
+        elif status == ERROR:
+            # Do not send validators for a page that was never saved
+            for key in ("etag", "last_modified", "content_hash"):
+                entry.pop(key, None)
+
+        with self.lock:
+            self.entries[url] = entry
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,132 @@
+import bisect
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets in seconds, from 10 µs doubling up to ~170 s
+BUCKETS = [1e-5 * 2 ** exponent for exponent in range(25)]
+
+class StageStats:
+    """Counters and a latency histogram for one stage of a scrape."""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.histogram = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds):
+        self.histogram[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, fraction):
+        """Estimate a latency percentile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.histogram):
+            seen += bucket_count
+            if seen >= rank:
+                return min(BUCKETS[bucket], self.max) if bucket < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.count if self.count else None,
+            "min_seconds": self.min,
+            "max_seconds": self.max,
+            "p50_seconds": self.percentile(0.5),
+            "p95_seconds": self.percentile(0.95),
+            "p99_seconds": self.percentile(0.99),
+            "histogram": {
+                ("inf" if bucket == len(BUCKETS) else f"{BUCKETS[bucket]:.6g}"): bucket_count
+                for bucket, bucket_count in enumerate(self.histogram) if bucket_count
+            },
+            "counters": dict(self.counters),
+        }
+
+class Metrics:
+    """
+    Per-stage timings and counters of a scrape, safe to update from many threads.
+
+    Work done in the parser processes is timed there and reported back with its
+    result, see `record`.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+
+    def stage(self, name):
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = StageStats()
+            return self.stages[name]
+
+    def record(self, name, seconds):
+        stats = self.stage(name)
+        with self.lock:
+            stats.observe(seconds)
+
+    def count(self, name, counter, amount=1):
+        stats = self.stage(name)
+        with self.lock:
+            stats.counters[counter] += amount
+
+    @contextmanager
+    def timer(self, name):
+        """Time the body of a `with` block as one observation of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.started_at = time.time()
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "elapsed_seconds": time.time() - self.started_at,
+                "stages": {name: stats.to_dict() for name, stats in self.stages.items()},
+            }
+
+    def report(self):
+        """Return a table of every stage for the end of a run."""
+        data = self.to_dict()
+        milliseconds = lambda seconds: "-" if seconds is None else f"{seconds * 1000:.1f}"
+        lines = [
+            f"Run took {data['elapsed_seconds']:.1f} s",
+            f"{'stage':24} {'count':>7} {'total s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  counters",
+        ]
+        for name, stats in data["stages"].items():
+            counters = ", ".join(f"{counter}={value}" for counter, value in sorted(stats["counters"].items()))
+            lines.append(
+                f"{name:24} {stats['count']:>7} {stats['total_seconds']:>9.2f} {milliseconds(stats['mean_seconds']):>9} "
+                f"{milliseconds(stats['p50_seconds']):>9} {milliseconds(stats['p95_seconds']):>9} "
+                f"{milliseconds(stats['p99_seconds']):>9}  {counters}"
+            )
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Write every stage's counters and histogram to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+# Shared by every module of the scraper, like a logger
+metrics = Metrics()
@@ -0,0 +1,148 @@
+from collections import Counter
+
+import numpy as np
+
+from nutrient_values import convert, nutrient_key, parse_quantity
+from recipe_store import TAG_FIELDS
+
+# The recommendation requirement the scraper used to split its output folders on
+MEETS_REQUIREMENTS = {"minimum": {"dietary_fiber": "5 g"}, "maximum": {"saturated_fat": "5 g"}}
+
+class NutrientIndex:
+    """
+    In-memory nutrient matrix over the recipe corpus for fast filtering and ranking.
+
+    Every nutrition value is parsed once into `matrix`, one row per recipe and one
+    column per nutrient, in the unit most recipes use for that nutrient (see
+    `units`). Missing or unconvertible values are NaN, so they never satisfy a
+    bound. Diets and categories are kept as one boolean mask per tag.
+    """
+
+    def __init__(self, recipes):
+        self.recipe_urls = []
+        self.titles = []
+        quantities = []
+        tags = {field: {} for field in TAG_FIELDS}
+
+        for row, recipe in enumerate(recipes):
+            self.recipe_urls.append(recipe["recipe_url"])
+            self.titles.append(recipe["title"])
+            quantities.append({
+                nutrient_key(name): parse_quantity(value) for name, value in recipe.get("nutrition_info", {}).items()
+            })
+            for field in TAG_FIELDS:
+                for tag in recipe.get(field, []):
+                    tags[field].setdefault(tag, []).append(row)
+
+        unit_counts = {}
+        for recipe_quantities in quantities:
+            for nutrient, (amount, unit) in recipe_quantities.items():
+                if amount is not None:
+                    unit_counts.setdefault(nutrient, Counter())[unit] += 1
+        self.nutrients = sorted(unit_counts)
+        self.units = {nutrient: unit_counts[nutrient].most_common(1)[0][0] for nutrient in self.nutrients}
+        self.columns = {nutrient: column for column, nutrient in enumerate(self.nutrients)}
+
+        self.matrix = np.full((len(self.recipe_urls), len(self.nutrients)), np.nan)
+        for row, recipe_quantities in enumerate(quantities):
+            for nutrient, (amount, unit) in recipe_quantities.items():
+                if amount is not None:
+                    converted = convert(amount, unit, self.units[nutrient])
+                    if converted is not None:
+                        self.matrix[row, self.columns[nutrient]] = converted
+
+        # Rank on z-scores so that weights mean the same thing for grams and milligrams.
+        # Every column holds at least one value, the recipes that set its unit.
+        if len(self.recipe_urls):
+            mean = np.nanmean(self.matrix, axis=0)
+            std = np.nanstd(self.matrix, axis=0)
+        else:
+            mean = np.zeros(len(self.nutrients))
+            std = np.ones(len(self.nutrients))
+        std = np.where(np.isnan(std) | (std == 0), 1.0, std)
+        self.standardized = np.nan_to_num((self.matrix - mean) / std, nan=0.0)
+
+        self.tag_masks = {field: {} for field in TAG_FIELDS}
+        for field, rows_by_tag in tags.items():
+            for tag, rows in rows_by_tag.items():
+                mask = np.zeros(len(self.recipe_urls), dtype=bool)
+                mask[rows] = True
+                self.tag_masks[field][tag] = mask
+
+    @classmethod
+    def from_store(cls, store):
+        return cls(store.iter_recipes())
+
+    def __len__(self):
+        return len(self.recipe_urls)
+
+    def column(self, nutrient):
+        """Return the matrix column of a nutrient, given as "dietary_fiber" or "Dietary Fiber"."""
+        key = nutrient_key(nutrient)
+        if key not in self.columns:
+            raise KeyError(f"Unknown nutrient: {nutrient}")
+        return self.columns[key]
+
+    def amount(self, nutrient, value):
+        """Express a bound such as 5 or "500 mg" in the unit used for the nutrient."""
+        amount, unit = parse_quantity(value)
+        if amount is None:
+            raise ValueError(f"Could not read an amount from {value!r}")
+        if isinstance(value, (int, float)) or unit == "":
+            return amount
+        converted = convert(amount, unit, self.units[nutrient_key(nutrient)])
+        if converted is None:
+            raise ValueError(f"Cannot compare {value!r} with {nutrient} in {self.units[nutrient_key(nutrient)]!r}")
+        return converted
+
+    def mask(self, minimum=None, maximum=None, **tags):
+        """
+        Return a boolean mask of the recipes matching every constraint.
+
+        Parameters:
+        - minimum (dict): Lower bounds keyed by nutrient (e.g., {'dietary_fiber': 5}).
+        - maximum (dict): Upper bounds keyed by nutrient (e.g., {'sodium': '500 mg'}).
+        - tags: Lists of required tags keyed by tag field (e.g., diets=['vegan'], courses=['Breakfast']).
+        """
+        mask = np.ones(len(self.recipe_urls), dtype=bool)
+        for bounds, compare in ((minimum, np.greater_equal), (maximum, np.less_equal)):
+            for nutrient, value in (bounds or {}).items():
+                with np.errstate(invalid="ignore"):
+                    mask &= compare(self.matrix[:, self.column(nutrient)], self.amount(nutrient, value))
+
+        for field, values in tags.items():
+            if field not in self.tag_masks:
+                raise ValueError(f"Unknown tag field: {field}")
+            for value in values:
+                tag_mask = self.tag_masks[field].get(value)
+                if tag_mask is None:
+                    return np.zeros(len(self.recipe_urls), dtype=bool)
+                mask &= tag_mask
+        return mask
+
+    def query(self, minimum=None, maximum=None, weights=None, top_k=10, **tags):
+        """
+        Return up to `top_k` (recipe_url, score) pairs matching the constraints, best first.
+
+        Recipes are scored by the weighted sum of their standardized nutrients, so
+        e.g. weights={'protein': 1, 'sodium': -0.5} favours protein and penalizes
+        sodium. Without weights every match scores 0 and they keep corpus order.
+        """
+        mask = self.mask(minimum, maximum, **tags)
+        rows = np.flatnonzero(mask)
+
+        scores = np.zeros(len(rows))
+        if weights:
+            columns = [self.column(nutrient) for nutrient in weights]
+            scores = self.standardized[np.ix_(rows, columns)] @ np.array(list(weights.values()), dtype=float)
+
+        if top_k is None or top_k >= len(rows):
+            best = np.argsort(-scores, kind="stable")
+        elif weights:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            # Sorting the partition by row first keeps ties in corpus order
+            best = np.sort(best)
+            best = best[np.argsort(-scores[best], kind="stable")]
+        else:
+            best = np.arange(top_k)
+        return [(self.recipe_urls[rows[i]], float(scores[i])) for i in best]
@@ -0,0 +1,37 @@
+import re
+
+AMOUNT_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?|\.\d+")
+QUANTITY_PATTERN = re.compile(r"(\d[\d,]*(?:\.\d+)?|\.\d+)\s*([a-zA-Zµ%]*)")
+
+# Mass units and their size in grams, every other unit is only compared with itself
+MASS_UNITS = {"kg": 1000.0, "g": 1.0, "mg": 1e-3, "mcg": 1e-6, "µg": 1e-6, "ug": 1e-6}
+UNIT_ALIASES = {"gram": "g", "grams": "g", "milligrams": "mg", "micrograms": "mcg", "cal": "kcal", "calories": "kcal"}
+
+def parse_amount(value):
+    """Return the number in a nutrition value such as "5 g" or "1,200 mg", or None."""
+    if value is None:
+        return None
+    match = AMOUNT_PATTERN.search(value)
+    return float(match.group().replace(",", "")) if match else None
+
+def parse_quantity(value):
+    """Split a nutrition value such as "1,200 mg" into (1200.0, "mg"); the unit is "" when there is none."""
+    if isinstance(value, (int, float)):
+        return float(value), ""
+    match = QUANTITY_PATTERN.search(value or "")
+    if match is None:
+        return None, ""
+    unit = match.group(2).lower()
+    return float(match.group(1).replace(",", "")), UNIT_ALIASES.get(unit, unit)
+
+def convert(amount, unit, target_unit):
+    """Convert an amount to another unit, or return None when the units are not comparable."""
+    if unit == target_unit:
+        return amount
+    if unit in MASS_UNITS and target_unit in MASS_UNITS:
+        return amount * MASS_UNITS[unit] / MASS_UNITS[target_unit]
+    return None
+
+def nutrient_key(name):
+    """Turn a nutrition table row name such as "Dietary Fiber" into "dietary_fiber"."""
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
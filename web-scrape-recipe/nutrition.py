@@ -0,0 +1,154 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+from bs4 import BeautifulSoup
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from extractors import parse_nutrition_table
+from metrics import metrics
+
+NUTRITION_TABLE_SELECTOR = ".panel.panel-expanded"
+EXPAND_BUTTON_SELECTOR = "label[for='panel-expand']"
+
+class BrowserPool:
+    """
+    A small pool of long-lived Chrome sessions that are reused across recipes.
+
+    Browsers are started lazily, so a run that never needs the fallback never
+    launches Chrome.
+    """
+
+    def __init__(self, size=2, headless=True, timeout=10):
+        self.size = size
+        self.headless = headless
+        self.timeout = timeout
+        self.idle = queue.Queue()
+        self.drivers = []
+        self.lock = threading.Lock()
+        # One slot per browser, whether it is idle, in use or not started yet
+        self.slots = threading.BoundedSemaphore(size)
+
+    def new_driver(self):
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument("--headless=new")
+        driver = webdriver.Chrome(options=options)
+        # Selenium waits up to 300 s for a page load by default
+        driver.set_page_load_timeout(self.timeout)
+        return driver
+
+    @contextmanager
+    def session(self):
+        """
+        Borrow a browser, starting a new one while the pool is not full.
+
+        A browser that fails with anything but a timeout (e.g. Chrome crashed,
+        the session was lost or chromedriver died) is quit instead of returned,
+        so the next borrower starts a fresh one.
+        """
+        self.slots.acquire()
+        try:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                driver = self.new_driver()
+                with self.lock:
+                    self.drivers.append(driver)
+
+            broken = False
+            try:
+                yield driver
+            except Exception as error:
+                # A timeout only means the page was slow, the browser is still fine. Anything
+                # else may be a dead chromedriver, which raises connection errors rather
+                # than WebDriverExceptions
+                broken = not isinstance(error, TimeoutException)
+                raise
+            finally:
+                if broken:
+                    self.discard(driver)
+                else:
+                    self.idle.put(driver)
+        finally:
+            self.slots.release()
+
+    def discard(self, driver):
+        with self.lock:
+            self.drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception as error:
+            print(f"Could not quit a broken browser: {error}")
+
+    def scrape_nutrition(self, recipe_link):
+        """Load a recipe page, expand the nutrition panel and read its table."""
+        with self.session() as driver:
+            driver.get(recipe_link)
+            wait = WebDriverWait(driver, self.timeout)
+
+            # Click the "Show Full Display" radio button to expand the nutrition info
+            expand_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, EXPAND_BUTTON_SELECTOR)))
+            expand_button.click()
+
+            # Read the whole table in one round trip instead of one per cell
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, f"{NUTRITION_TABLE_SELECTOR} tbody tr")))
+            table = driver.find_element(By.CSS_SELECTOR, NUTRITION_TABLE_SELECTOR)
+            table_html = f"<div class='panel panel-expanded'>{table.get_attribute('innerHTML')}</div>"
+        return parse_nutrition_table(BeautifulSoup(table_html, "html.parser"))
+
+    def close(self):
+        for driver in self.drivers:
+            driver.quit()
+        self.drivers = []
+        self.idle = queue.Queue()
+
+class NutritionExtractor:
+    """
+    Extract nutrition info from the static HTML, falling back to a browser.
+
+    `stats` counts how each recipe was resolved: "static" when the table was in
+    the downloaded HTML, "fallback" every time the browser had to be used,
+    "browser" when the browser found the table and "missing" when it did not.
+    The counts are kept in the "nutrition_extraction" stage of the run's metrics.
+    """
+
+    def __init__(self, browser_pool=None):
+        self.browser_pool = browser_pool or BrowserPool()
+
+    @property
+    def stats(self):
+        return metrics.stage("nutrition_extraction").counters
+
+    def count(self, outcome):
+        metrics.count("nutrition_extraction", outcome)
+
+    def extract(self, recipe_link, static_nutrition_info):
+        """Return the nutrition info parsed from the static HTML, or else scraped by a browser."""
+        nutrition_info = static_nutrition_info
+        if nutrition_info:
+            self.count("static")
+            return nutrition_info
+
+        self.count("fallback")
+        try:
+            nutrition_info = self.browser_pool.scrape_nutrition(recipe_link)
+        except Exception as error:
+            print(f"Browser could not load nutrition info for {recipe_link}: {error}")
+            nutrition_info = {}
+
+        self.count("browser" if nutrition_info else "missing")
+        return nutrition_info
+
+    def report(self):
+        total = self.stats["static"] + self.stats["fallback"]
+        fallback_rate = self.stats["fallback"] / total if total else 0.0
+        return (f"Nutrition info: {self.stats['static']} from HTML, {self.stats['browser']} from browser, "
+                f"{self.stats['missing']} missing (browser fallback on {fallback_rate:.0%} of recipes)")
+
+    def close(self):
+        self.browser_pool.close()
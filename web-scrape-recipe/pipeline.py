@@ -0,0 +1,305 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from diet import classify_diets
+from extractors import get_extractor
+from manifest import DEFAULT_MAX_AGE, OK, SKIPPED, NUTRITION_MISSING, ERROR
+from metrics import metrics
+
+# Marks the end of a stage's output
+DONE = object()
+
+# Each worker process builds its own extractor on first use
+worker_extractor = None
+
+def parse_recipe_page(content):
+    """
+    Parse a recipe page and classify its diets. Runs in a worker process.
+
+    Returns the recipe and the seconds spent on each stage, since the worker
+    cannot update the metrics of the main process. Raises ValueError when the
+    page has no recipe article.
+    """
+    global worker_extractor
+    if worker_extractor is None:
+        worker_extractor = get_extractor()
+
+    start = time.perf_counter()
+    recipe = worker_extractor.parse_recipe(content)
+    parsed = time.perf_counter()
+    if recipe is None:
+        raise ValueError("Page has no recipe article")
+
+    # One pass over the ingredients gives every diet flag at once
+    diets_dict, _ = classify_diets(recipe["ingredients"])
+    recipe["diets"] = [diet for diet, is_diet in diets_dict.items() if is_diet]
+    timings = {"html_parse": parsed - start, "diet_classification": time.perf_counter() - parsed}
+    return recipe, timings
+
+def build_recipe_data(recipe_link, recipe, nutrition_info, category_index):
+    """Assemble the saved recipe from its parsed page, nutrition info and categories."""
+    with metrics.timer("category_lookup"):
+        recipe_categories = category_index.lookup(recipe_link)
+    return {
+        "title": recipe["title"],
+        "recipe_url": recipe_link,
+        "image_url": recipe["image_url"],
+        "servings": recipe["servings"],
+        "description": recipe["description"],
+        "ingredients": recipe["ingredients"],
+        "instructions": recipe["instructions"],
+        "nutrition_info": nutrition_info,
+        "courses": recipe_categories["courses"],
+        "food_groups": recipe_categories["food_groups"],
+        "cuisines": recipe_categories["cuisines"],
+        "diets": recipe["diets"]
+    }
+
+class RecipePipeline:
+    """
+    Scrape recipe pages in three stages connected by bounded queues.
+
+    1. fetch: the fetcher downloads pages concurrently on its thread pool.
+    2. parse: pages are parsed and diet-classified in a pool of worker processes.
+    3. finish: the main thread adds nutrition info and categories, and hands
+       the recipe to the store, which writes in batches, and to the similarity
+       index. Recipes whose nutrition table is not in the static HTML go to the
+       browser fallback on a thread per browser first, so a slow browser never
+       holds up the other recipes.
+
+    At most `queue_size` fetched pages wait for a worker and at most
+    `2 * workers` pages are in the workers or waiting to be finished, so a slow
+    stage holds back the ones before it instead of piling up pages in memory.
+    A page that fails in any stage only fails that recipe, which is recorded as
+    an error in the manifest. If a whole stage fails (e.g. the worker pool
+    broke), the run stops, every recipe it did not get to is recorded as an
+    error, and the stage's exception is raised from `run`.
+
+    Parameters:
+    - fetcher (Fetcher): The fetcher used to download the recipe pages.
+    - category_index (CategoryIndex): The index of recipe links to their categories.
+    - nutrition_extractor (NutritionExtractor): The extractor used for the browser fallback.
+    - manifest (CrawlManifest): The manifest of previous crawls.
+    - store (RecipeStore): The store the recipes are written to in batches.
+    - workers (int): The number of parser processes, one per core by default.
+    - queue_size (int): How many fetched pages may wait for a parser.
+    - similarity_index (SimilarityIndex): An index kept up to date with every saved recipe, if given.
+    """
+
+    def __init__(self, fetcher, category_index, nutrition_extractor, manifest, store, workers=None, queue_size=64, similarity_index=None):
+        self.fetcher = fetcher
+        self.category_index = category_index
+        self.nutrition_extractor = nutrition_extractor
+        self.manifest = manifest
+        self.store = store
+        self.similarity_index = similarity_index
+        self.workers = workers or os.cpu_count() or 1
+        self.fetched = queue.Queue(maxsize=queue_size)
+        self.parsed = queue.Queue()
+        self.in_flight = threading.Semaphore(2 * self.workers)
+        self.stage_errors = []
+        # URLs of the recipes already in the store, read at the start of a run
+        self.stored = set()
+        # Set when the parse stage fails, so the fetch stage stops fetching pages
+        self.stopping = threading.Event()
+
+    def fetch_stage(self, recipe_links):
+        # Recipes handed on to the parse stage or recorded, the rest are dropped on failure
+        done = 0
+        try:
+            pages = self.fetcher.fetch_all(recipe_links, headers_for=self.conditional_headers, stage="detail_fetch")
+            for recipe_link, page in pages:
+                if self.stopping.is_set():
+                    # The parse stage failed, nothing fetched from now on would be parsed
+                    pages.close()
+                    break
+                self.route_page(recipe_link, page)
+                done += 1
+        except Exception as error:
+            self.stage_errors.append(error)
+        finally:
+            self.drop(recipe_links[done:])
+            self.fetched.put(DONE)
+
+    def route_page(self, recipe_link, page):
+        """Record a page that failed or has not changed, or queue it for the parse stage."""
+        if page is None or page.status_code not in (200, 304):
+            metrics.count("recipes", ERROR)
+            self.manifest.record(recipe_link, ERROR)
+            return
+
+        if recipe_link in self.stored and self.manifest.is_unchanged(recipe_link, page):
+            print(f"Recipe {recipe_link} has not changed. Skipping...")
+            metrics.count("recipes", SKIPPED)
+            self.manifest.record(recipe_link, SKIPPED)
+            return
+
+        self.fetched.put((recipe_link, page))
+
+    def conditional_headers(self, recipe_link):
+        # A 304 has no page to parse, so only ask for one when the recipe is in the store
+        if recipe_link not in self.stored:
+            return {}
+        return self.manifest.conditional_headers(recipe_link)
+
+    def is_fresh(self, recipe_link, max_age):
+        """Whether a recipe was crawled recently and its outcome is still in the store."""
+        if not self.manifest.is_fresh(recipe_link, max_age):
+            return False
+        # A recipe without nutrition info is never saved, the others must have been
+        return recipe_link in self.stored or self.manifest.get(recipe_link)["status"] == NUTRITION_MISSING
+
+    def drop(self, recipe_links):
+        """Record recipes that will not be scraped because a stage failed."""
+        for recipe_link in recipe_links:
+            metrics.count("recipes", ERROR)
+            self.manifest.record(recipe_link, ERROR)
+
+    def parse_stage(self, pool):
+        try:
+            while True:
+                item = self.fetched.get()
+                if item is DONE:
+                    break
+                recipe_link, page = item
+
+                self.in_flight.acquire()
+                try:
+                    future = pool.submit(parse_recipe_page, page.content)
+                except Exception:
+                    # e.g. BrokenProcessPool after a worker was killed
+                    self.in_flight.release()
+                    self.drop([recipe_link])
+                    raise
+                future.add_done_callback(lambda future, recipe_link=recipe_link, page=page: self.parsed.put(("parsed", recipe_link, page, future)))
+        except Exception as error:
+            self.stage_errors.append(error)
+            self.stopping.set()
+            # Keep emptying the queue so the fetch stage is never stuck on a full one
+            while True:
+                item = self.fetched.get()
+                if item is DONE:
+                    break
+                self.drop([item[0]])
+        finally:
+            # Every slot is back once the finish stage has taken the last parsed page,
+            # so no page can be handed over after DONE
+            for _ in range(2 * self.workers):
+                self.in_flight.acquire()
+            self.parsed.put(DONE)
+
+    def finish(self, recipe_link, page, future, unsaved):
+        """
+        Save a parsed recipe, or hand it to the browser fallback when its nutrition
+        table is not in the static HTML. Returns whether it was handed off.
+        """
+        recipe, timings = future.result()
+        for stage, seconds in timings.items():
+            metrics.record(stage, seconds)
+
+        if not recipe["nutrition_info"]:
+            # The browser needs a page load and up to its timeout to click "Show Full
+            # Display", so it runs on its own threads and the result comes back later
+            fallback = self.fallback_pool.submit(self.extract_nutrition, recipe_link, recipe["nutrition_info"])
+            fallback.add_done_callback(lambda fallback: self.parsed.put(("nutrition", recipe_link, page, recipe, fallback)))
+            return True
+
+        self.save(recipe_link, page, recipe, self.extract_nutrition(recipe_link, recipe["nutrition_info"]), unsaved)
+        return False
+
+    def extract_nutrition(self, recipe_link, static_nutrition_info):
+        with metrics.timer("nutrition_extraction"):
+            nutrition_info = self.nutrition_extractor.extract(recipe_link, static_nutrition_info)
+        return nutrition_info
+
+    def save(self, recipe_link, page, recipe, nutrition_info, unsaved):
+        if nutrition_info == {}:
+            print(f"Could not scrape nutrition info for {recipe['title']}. Skipping...")
+            metrics.count("recipes", NUTRITION_MISSING)
+            self.manifest.record(recipe_link, NUTRITION_MISSING, page)
+            return
+
+        recipe_data = build_recipe_data(recipe_link, recipe, nutrition_info, self.category_index)
+        self.store.add(recipe_data)
+        if self.similarity_index is not None:
+            self.similarity_index.add(recipe_data)
+        unsaved.append((recipe_link, page))
+        print(f"Recipe '{recipe['title']}' scraped")
+        if not self.store.pending:
+            self.mark_saved(unsaved)
+
+    def mark_saved(self, unsaved):
+        """Record the recipes of a written batch as done in the manifest."""
+        for saved_link, saved_page in unsaved:
+            self.manifest.record(saved_link, OK, saved_page)
+        metrics.count("recipes", OK, len(unsaved))
+        unsaved.clear()
+
+    def run(self, all_recipe_links, max_age=DEFAULT_MAX_AGE):
+        """
+        Scrape the details of every recipe and save them to the recipe store.
+
+        Recipes crawled less than `max_age` ago are not fetched again, the others are
+        fetched with conditional requests and skipped when the page has not changed.
+        Either way a recipe is only skipped when it is in the store.
+        Every outcome is recorded in the manifest as soon as the recipe is done; a
+        saved recipe is only done once the store has written its batch.
+        """
+        # The manifest may be ahead of the store, e.g. when the database was deleted or
+        # another store path is used, and recipes missing from the store are scraped again
+        self.stored = set(self.store.find())
+        recipe_links = [link for link in all_recipe_links if not self.is_fresh(link, max_age)]
+        print(f"Skipping {len(all_recipe_links) - len(recipe_links)} recipes crawled in the last {max_age}.")
+
+        # Spawned workers do not inherit locks held by the fetcher's threads
+        parse_pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        # One thread per browser, so every browser of the pool can be busy at once
+        self.fallback_pool = ThreadPoolExecutor(max_workers=self.nutrition_extractor.browser_pool.size)
+        with parse_pool, self.fallback_pool:
+            stages = [
+                threading.Thread(target=self.fetch_stage, args=(recipe_links,), name="fetch-stage", daemon=True),
+                threading.Thread(target=self.parse_stage, args=(parse_pool,), name="parse-stage", daemon=True),
+            ]
+            for stage in stages:
+                stage.start()
+
+            # Recipes waiting in the store's batch, marked as done once the batch is written
+            unsaved = []
+            parse_done = False
+            fallbacks = 0
+            while not parse_done or fallbacks:
+                item = self.parsed.get()
+                if item is DONE:
+                    parse_done = True
+                    continue
+
+                kind, recipe_link, page, *rest = item
+                try:
+                    if kind == "nutrition":
+                        fallbacks -= 1
+                        recipe, fallback = rest
+                        self.save(recipe_link, page, recipe, fallback.result(), unsaved)
+                    else:
+                        fallbacks += self.finish(recipe_link, page, rest[0], unsaved)
+                except Exception as error:
+                    print(f"Could not scrape {recipe_link}: {error}")
+                    metrics.count("recipes", ERROR)
+                    self.manifest.record(recipe_link, ERROR)
+                finally:
+                    # A recipe handed to the fallback no longer holds up the parse stage
+                    if kind == "parsed":
+                        self.in_flight.release()
+
+            for stage in stages:
+                stage.join()
+
+        self.store.flush()
+        self.mark_saved(unsaved)
+        print(self.nutrition_extractor.report())
+
+        if self.stage_errors:
+            raise self.stage_errors[0]
@@ -0,0 +1,235 @@
+import json
+import os
+import re
+import sqlite3
+
+from metrics import metrics
+from nutrient_values import parse_amount
+
+# Categorical fields of a recipe that can be queried through the tags table
+TAG_FIELDS = ["diets", "courses", "food_groups", "cuisines"]
+
+# Indexed nutrient columns and the nutrition table rows they are read from
+NUTRIENT_COLUMNS = {
+    "calories": "Total Calories",
+    "total_fat": "Total Fat",
+    "saturated_fat": "Saturated Fat",
+    "sodium": "Sodium",
+    "carbohydrates": "Carbohydrates",
+    "dietary_fiber": "Dietary Fiber",
+    "total_sugars": "Total Sugars",
+    "protein": "Protein",
+}
+
+# Words of the lowercased ingredient text, the keys of the ingredient postings
+INGREDIENT_WORD_PATTERN = re.compile(r"\w+")
+
+def ingredient_words(ingredients):
+    """Return the set of words in a recipe's ingredients."""
+    return {word for ingredient in ingredients for word in INGREDIENT_WORD_PATTERN.findall(ingredient.lower())}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS recipes (
+    recipe_url TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    data TEXT NOT NULL,
+    {", ".join(f"{column} REAL" for column in NUTRIENT_COLUMNS)}
+);
+CREATE TABLE IF NOT EXISTS recipe_tags (
+    field TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    recipe_url TEXT NOT NULL,
+    PRIMARY KEY (field, tag, recipe_url)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS recipe_tags_by_recipe ON recipe_tags (recipe_url);
+CREATE TABLE IF NOT EXISTS ingredient_words (
+    word TEXT NOT NULL,
+    recipe_url TEXT NOT NULL,
+    PRIMARY KEY (word, recipe_url)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ingredient_words_by_recipe ON ingredient_words (recipe_url);
+{"".join(f"CREATE INDEX IF NOT EXISTS recipes_by_{column} ON recipes ({column});" for column in NUTRIENT_COLUMNS)}
+"""
+
+class RecipeStore:
+    """
+    SQLite store holding every scraped recipe, keyed by its recipe URL.
+
+    The full recipe is kept as JSON in the `data` column. The diets and
+    categories are also written to an indexed tags table and the key
+    nutrients to indexed numeric columns, so recipes can be looked up without
+    loading the whole corpus. The words of the ingredients are kept as postings
+    from word to recipe, so the recipes that mention an ingredient can be found
+    without reading them all.
+    """
+
+    def __init__(self, path="data/recipes.db", batch_size=100):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, recipe):
+        """Queue a recipe to be written, writing the queue once it holds `batch_size` recipes."""
+        self.pending.append(recipe)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.write_recipes(self.pending)
+            self.pending = []
+
+    def write_recipes(self, recipes):
+        """Insert or replace many recipes in a single transaction."""
+        recipe_rows = []
+        tag_rows = []
+        word_rows = []
+        for recipe in recipes:
+            nutrition_info = recipe.get("nutrition_info", {})
+            amounts = [parse_amount(nutrition_info.get(name)) for name in NUTRIENT_COLUMNS.values()]
+            recipe_rows.append((recipe["recipe_url"], recipe["title"], json.dumps(recipe), *amounts))
+            for field in TAG_FIELDS:
+                tag_rows.extend((field, tag, recipe["recipe_url"]) for tag in recipe.get(field, []))
+            word_rows.extend((word, recipe["recipe_url"]) for word in ingredient_words(recipe.get("ingredients", [])))
+
+        placeholders = ", ".join("?" for _ in range(3 + len(NUTRIENT_COLUMNS)))
+        metrics.count("write", "recipes", len(recipe_rows))
+        with metrics.timer("write"), self.connection:
+            # A rescraped recipe may have lost some of its tags or ingredients
+            self.connection.executemany("DELETE FROM recipe_tags WHERE recipe_url = ?", [(row[0],) for row in recipe_rows])
+            self.connection.executemany("DELETE FROM ingredient_words WHERE recipe_url = ?", [(row[0],) for row in recipe_rows])
+            self.connection.executemany(f"INSERT OR REPLACE INTO recipes VALUES ({placeholders})", recipe_rows)
+            self.connection.executemany("INSERT OR IGNORE INTO recipe_tags VALUES (?, ?, ?)", tag_rows)
+            self.connection.executemany("INSERT OR IGNORE INTO ingredient_words VALUES (?, ?)", word_rows)
+
+    def update_diets(self, diets_by_url):
+        """
+        Replace the diets of saved recipes without rewriting anything else.
+
+        Parameters:
+        - diets_by_url (dict): The new list of diets keyed by recipe URL.
+        """
+        recipes = self.get_many(diets_by_url)
+        data_rows = []
+        tag_rows = []
+        for recipe_url, recipe in recipes.items():
+            recipe["diets"] = diets_by_url[recipe_url]
+            data_rows.append((json.dumps(recipe), recipe_url))
+            tag_rows.extend(("diets", diet, recipe_url) for diet in recipe["diets"])
+
+        with self.connection:
+            self.connection.executemany("UPDATE recipes SET data = ? WHERE recipe_url = ?", data_rows)
+            self.connection.executemany("DELETE FROM recipe_tags WHERE field = 'diets' AND recipe_url = ?", [(recipe_url,) for recipe_url in recipes])
+            self.connection.executemany("INSERT OR IGNORE INTO recipe_tags VALUES (?, ?, ?)", tag_rows)
+        return len(recipes)
+
+    def index_ingredients(self):
+        """Rebuild the ingredient postings of every recipe, e.g. for a store saved before they existed."""
+        with self.connection:
+            self.connection.execute("DELETE FROM ingredient_words")
+            for recipe in self.iter_recipes():
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO ingredient_words VALUES (?, ?)",
+                    [(word, recipe["recipe_url"]) for word in ingredient_words(recipe.get("ingredients", []))],
+                )
+
+    def ingredient_vocabulary(self):
+        """Return every word that appears in the ingredients of a saved recipe."""
+        return [word for (word,) in self.connection.execute("SELECT DISTINCT word FROM ingredient_words")]
+
+    def find_by_ingredient_words(self, words):
+        """Return the URLs of the recipes whose ingredients contain any of the given words."""
+        recipe_urls = set()
+        words = list(words)
+        for start in range(0, len(words), 500):
+            chunk = words[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            recipe_urls.update(recipe_url for (recipe_url,) in self.connection.execute(
+                f"SELECT recipe_url FROM ingredient_words WHERE word IN ({placeholders})", chunk
+            ))
+        return recipe_urls
+
+    def get(self, recipe_url):
+        """Return the recipe saved for a URL, or None."""
+        row = self.connection.execute("SELECT data FROM recipes WHERE recipe_url = ?", (recipe_url,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, recipe_urls):
+        """Return {recipe_url: recipe} for the URLs that are in the store."""
+        recipes = {}
+        recipe_urls = list(recipe_urls)
+        # Stay well below SQLite's limit on the number of query parameters
+        for start in range(0, len(recipe_urls), 500):
+            chunk = recipe_urls[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            for recipe_url, data in self.connection.execute(
+                f"SELECT recipe_url, data FROM recipes WHERE recipe_url IN ({placeholders})", chunk
+            ):
+                recipes[recipe_url] = json.loads(data)
+        return recipes
+
+    def iter_recipes(self):
+        """Stream every recipe without loading the whole corpus into memory."""
+        for (data,) in self.connection.execute("SELECT data FROM recipes ORDER BY recipe_url"):
+            yield json.loads(data)
+
+    def find(self, min_nutrients=None, max_nutrients=None, **tags):
+        """
+        Return the URLs of the recipes matching every given constraint.
+
+        Parameters:
+        - min_nutrients (dict): Lower bounds keyed by nutrient column (e.g., {'dietary_fiber': 5}).
+        - max_nutrients (dict): Upper bounds keyed by nutrient column (e.g., {'saturated_fat': 5}).
+        - tags: Lists of required tags keyed by tag field (e.g., diets=['vegan'], cuisines=['Asian']).
+        """
+        conditions = []
+        parameters = []
+        for bounds, operator in ((min_nutrients, ">="), (max_nutrients, "<=")):
+            for column, amount in (bounds or {}).items():
+                if column not in NUTRIENT_COLUMNS:
+                    raise ValueError(f"Unknown nutrient column: {column}")
+                conditions.append(f"{column} {operator} ?")
+                parameters.append(amount)
+
+        for field, values in tags.items():
+            if field not in TAG_FIELDS:
+                raise ValueError(f"Unknown tag field: {field}")
+            for value in values:
+                conditions.append("recipe_url IN (SELECT recipe_url FROM recipe_tags WHERE field = ? AND tag = ?)")
+                parameters.extend([field, value])
+
+        query = "SELECT recipe_url FROM recipes"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return [recipe_url for (recipe_url,) in self.connection.execute(query + " ORDER BY recipe_url", parameters)]
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+def import_json_recipes(store, folders=("data/meet_requirements_recipes", "data/other_recipes")):
+    """Load recipes saved by older runs as one JSON file per recipe into the store."""
+    count = 0
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for file_name in sorted(os.listdir(folder)):
+            if file_name.endswith(".json"):
+                with open(os.path.join(folder, file_name), "r") as f:
+                    store.add(json.load(f))
+                count += 1
+    store.flush()
+    print(f"Imported {count} recipes into {store.path}")
+    return count
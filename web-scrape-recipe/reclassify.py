@@ -0,0 +1,125 @@
+"""
+Update the diets of saved recipes after a lexicon file in data/ was edited.
+
+Run from where the scraper runs, since diet.py reads its lexicons from data/:
+
+    python web-scrape-recipe/reclassify.py
+
+The lexicons the saved diets were computed with are kept in a snapshot. The
+command diffs the snapshot against the current lexicon files and only
+re-evaluates the recipes whose ingredients could contain an added or removed
+term, found through the store's ingredient postings. Recipes whose diets
+changed are updated in place, in the store and in the saved similarity
+index, and the snapshot is replaced by the current lexicons. Without a
+snapshot (the first run), or with `--full`, every recipe is re-evaluated.
+"""
+import argparse
+import json
+import os
+import re
+
+from diet import DIETS, LEXICONS, diet_classifier
+from recipe_store import INGREDIENT_WORD_PATTERN, RecipeStore
+from similarity_index import SIMILARITY_INDEX_PATH, load_similarity_index
+
+def load_lexicon_snapshot(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_lexicon_snapshot(path, lexicons, diets):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"lexicons": {name: sorted(set(terms)) for name, terms in lexicons.items()}, "diets": diets}, f, indent=2)
+    os.replace(temp_path, path)
+
+def changed_terms(old_lexicons, new_lexicons):
+    """Return every term added to or removed from any lexicon."""
+    changed = set()
+    for name in old_lexicons.keys() | new_lexicons.keys():
+        changed |= set(old_lexicons.get(name, [])) ^ set(new_lexicons.get(name, []))
+    return changed
+
+def affected_recipes(store, terms):
+    """
+    Return the URLs of the recipes whose ingredients could contain one of the terms,
+    or None when every recipe could.
+
+    Terms match anywhere in the ingredient text ("egg" is found in "eggplant"), so
+    each word of a matching term is part of a word of the ingredient. The longest
+    word of every term is looked up in the vocabulary of the ingredient postings,
+    and the recipes of every vocabulary word containing it are candidates.
+    """
+    term_words = []
+    for term in terms:
+        words = INGREDIENT_WORD_PATTERN.findall(term)
+        if not words:
+            # An empty or punctuation-only term is not tied to any word
+            return None
+        term_words.append(max(words, key=len))
+    if not term_words:
+        return set()
+
+    pattern = re.compile("|".join(re.escape(word) for word in sorted(set(term_words), key=len, reverse=True)))
+    matching_words = [word for word in store.ingredient_vocabulary() if pattern.search(word)]
+    return store.find_by_ingredient_words(matching_words)
+
+def reclassify(recipes, classifier=diet_classifier):
+    """
+    Re-evaluate the diets of the given recipes and return {recipe_url: new diets}
+    for the ones that changed.
+    """
+    updates = {}
+    for recipe in recipes:
+        diets_dict, _ = classifier.classify(recipe.get("ingredients", []))
+        diets = [diet for diet, is_diet in diets_dict.items() if is_diet]
+        if diets != recipe.get("diets"):
+            updates[recipe["recipe_url"]] = diets
+    return updates
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data/recipes.db", help="the recipe store to update")
+    parser.add_argument("--similarity-index", default=SIMILARITY_INDEX_PATH, help="the similarity index to update")
+    parser.add_argument("--snapshot", default="data/lexicon_snapshot.json", help="the lexicons the saved diets were computed with")
+    parser.add_argument("--full", action="store_true", help="re-evaluate every recipe")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes without saving them")
+    args = parser.parse_args()
+
+    snapshot = load_lexicon_snapshot(args.snapshot)
+    with RecipeStore(args.db) as store:
+        if snapshot is None or args.full or snapshot["diets"] != DIETS:
+            print("Re-evaluating every recipe...")
+            # Stores saved before the ingredient postings existed need them for the next run
+            store.index_ingredients()
+            candidates = None
+        else:
+            terms = changed_terms(snapshot["lexicons"], LEXICONS)
+            print(f"{len(terms)} lexicon terms were added or removed: {', '.join(sorted(terms)) or 'none'}")
+            candidates = affected_recipes(store, terms)
+
+        if candidates is None:
+            recipes = store.iter_recipes()
+        else:
+            recipes = store.get_many(candidates).values()
+        updates = reclassify(recipes)
+        evaluated = len(store) if candidates is None else len(candidates)
+        print(f"Re-evaluated {evaluated} of {len(store)} recipes, {len(updates)} have new diets.")
+
+        if args.dry_run:
+            for recipe_url, diets in sorted(updates.items()):
+                print(f"{recipe_url}: {diets}")
+            return
+
+        store.update_diets(updates)
+        # The index filters similar recipes by diet with its own copy of them
+        if os.path.exists(args.similarity_index):
+            similarity_index = load_similarity_index(store, args.similarity_index)
+            for recipe_url, diets in updates.items():
+                similarity_index.set_diets(recipe_url, diets)
+            similarity_index.save(args.similarity_index)
+    save_lexicon_snapshot(args.snapshot, LEXICONS, DIETS)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+
+# Words in an ingredient line that say how much or how it is prepared, not what it is
+STOP_WORDS = {
+    "a", "an", "and", "or", "of", "to", "for", "with", "in", "into", "about", "plus", "as", "at", "if", "the",
+    "cup", "cups", "tablespoon", "tablespoons", "tbsp", "teaspoon", "teaspoons", "tsp", "ounce", "ounces", "oz",
+    "pound", "pounds", "lb", "lbs", "pint", "quart", "gallon", "can", "cans", "package", "packages", "pkg",
+    "clove", "cloves", "slice", "slices", "piece", "pieces", "pinch", "dash", "large", "medium", "small",
+    "whole", "fresh", "frozen", "canned", "dried", "chopped", "diced", "minced", "sliced", "grated", "shredded",
+    "peeled", "cooked", "uncooked", "divided", "optional", "taste", "low", "fat", "free", "reduced", "sodium",
+    "finely", "coarsely", "thinly", "cut", "inch", "cubes", "drained", "rinsed", "packed", "softened", "melted",
+}
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+SIMILARITY_INDEX_PATH = "data/similarity_index.json"
+
+def stem(word):
+    """Fold simple English plurals so that "tomatoes" and "tomato" share a token."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("oes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def ingredient_tokens(ingredients):
+    """Count the normalized ingredient tokens of a recipe."""
+    tokens = Counter()
+    for ingredient in ingredients:
+        for word in WORD_PATTERN.findall(ingredient.lower()):
+            if word not in STOP_WORDS and len(word) > 1:
+                tokens[stem(word)] += 1
+    return tokens
+
+class SimilarityIndex:
+    """
+    TF-IDF index over ingredient tokens answering "recipes like this one".
+
+    Each recipe is a sparse vector of sublinear term frequencies, stored as
+    postings from token to {recipe_url: tf}. A query only scores the recipes that
+    share a token with it, so it never compares against the whole corpus.
+
+    Recipes can be added or removed at any time. The IDF weights are a snapshot
+    that is refreshed (together with the recipe norms) once the corpus has grown
+    or shrunk by `refresh_ratio` since the last snapshot, so adding one recipe
+    does not rebuild the index.
+    """
+
+    def __init__(self, refresh_ratio=0.1):
+        self.refresh_ratio = refresh_ratio
+        self.documents = {}
+        self.postings = {}
+        self.document_frequency = Counter()
+        self.idf_document_frequency = {}
+        self.idf_size = 0
+        self.norms = {}
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __contains__(self, recipe_url):
+        return recipe_url in self.documents
+
+    def idf(self, token):
+        return math.log((1 + self.idf_size) / (1 + self.idf_document_frequency.get(token, 0))) + 1
+
+    def vector(self, tokens):
+        """Return the TF-IDF weights of a token count and their norm."""
+        weights = {token: (1 + math.log(count)) * self.idf(token) for token, count in tokens.items()}
+        return weights, math.sqrt(sum(weight * weight for weight in weights.values()))
+
+    def add(self, recipe, refresh=True):
+        """Add a recipe, replacing the previous version of it if it was already indexed."""
+        recipe_url = recipe["recipe_url"]
+        if recipe_url in self.documents:
+            self.remove(recipe_url)
+
+        tokens = ingredient_tokens(recipe.get("ingredients", []))
+        self.documents[recipe_url] = {"tokens": tokens, "diets": set(recipe.get("diets", []))}
+        for token, count in tokens.items():
+            self.postings.setdefault(token, {})[recipe_url] = 1 + math.log(count)
+            self.document_frequency[token] += 1
+        self.norms[recipe_url] = self.vector(tokens)[1]
+        if refresh:
+            self.refresh_if_stale()
+
+    def remove(self, recipe_url):
+        document = self.documents.pop(recipe_url)
+        for token in document["tokens"]:
+            del self.postings[token][recipe_url]
+            if not self.postings[token]:
+                del self.postings[token]
+            self.document_frequency[token] -= 1
+            if not self.document_frequency[token]:
+                del self.document_frequency[token]
+        del self.norms[recipe_url]
+        self.refresh_if_stale()
+
+    def set_diets(self, recipe_url, diets):
+        """Replace the diets of an indexed recipe, e.g. after it was reclassified."""
+        self.documents[recipe_url]["diets"] = set(diets)
+
+    def refresh_if_stale(self):
+        if abs(len(self.documents) - self.idf_size) > self.refresh_ratio * self.idf_size:
+            self.refresh()
+
+    def refresh(self):
+        """Take a new IDF snapshot of the current corpus and recompute every norm."""
+        self.idf_document_frequency = dict(self.document_frequency)
+        self.idf_size = len(self.documents)
+        for recipe_url, document in self.documents.items():
+            self.norms[recipe_url] = self.vector(document["tokens"])[1]
+
+    def search(self, tokens, top_k=10, diets=None, exclude=None):
+        """
+        Return the `top_k` (recipe_url, cosine similarity) pairs closest to a token count.
+
+        Parameters:
+        - tokens (Counter): The ingredient tokens to compare against.
+        - top_k (int): The number of recipes to return.
+        - diets (list): Diets every returned recipe must follow (e.g., ['vegan']).
+        - exclude (str): A recipe URL to leave out, usually the recipe itself.
+        """
+        weights, norm = self.vector(tokens)
+        if not norm:
+            return []
+        required_diets = set(diets or [])
+
+        scores = Counter()
+        for token, weight in weights.items():
+            idf = self.idf(token)
+            for recipe_url, tf in self.postings.get(token, {}).items():
+                scores[recipe_url] += weight * tf * idf
+
+        candidates = (
+            (score / (norm * self.norms[recipe_url]), recipe_url)
+            for recipe_url, score in scores.items()
+            if recipe_url != exclude and required_diets <= self.documents[recipe_url]["diets"]
+        )
+        return [(recipe_url, score) for score, recipe_url in heapq.nlargest(top_k, candidates)]
+
+    def similar(self, recipe_url, top_k=10, diets=None):
+        """Return the recipes most similar to an indexed recipe."""
+        return self.search(self.documents[recipe_url]["tokens"], top_k, diets, exclude=recipe_url)
+
+    def similar_to_ingredients(self, ingredients, top_k=10, diets=None):
+        """Return the recipes most similar to a list of ingredient lines."""
+        return self.search(ingredient_tokens(ingredients), top_k, diets)
+
+    def save(self, path):
+        data = {
+            "refresh_ratio": self.refresh_ratio,
+            "idf_size": self.idf_size,
+            "idf_document_frequency": self.idf_document_frequency,
+            "documents": {
+                recipe_url: {"tokens": document["tokens"], "diets": sorted(document["diets"])}
+                for recipe_url, document in self.documents.items()
+            },
+        }
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved index, keeping the IDF snapshot it was saved with."""
+        with open(path, "r") as f:
+            data = json.load(f)
+        index = cls(data["refresh_ratio"])
+        index.idf_size = data["idf_size"]
+        index.idf_document_frequency = data["idf_document_frequency"]
+        for recipe_url, document in data["documents"].items():
+            tokens = Counter(document["tokens"])
+            index.documents[recipe_url] = {"tokens": tokens, "diets": set(document["diets"])}
+            for token, count in tokens.items():
+                index.postings.setdefault(token, {})[recipe_url] = 1 + math.log(count)
+                index.document_frequency[token] += 1
+            index.norms[recipe_url] = index.vector(tokens)[1]
+        return index
+
+def build_similarity_index(recipes, refresh_ratio=0.1):
+    """Index many recipes at once with a single IDF snapshot at the end."""
+    index = SimilarityIndex(refresh_ratio)
+    for recipe in recipes:
+        index.add(recipe, refresh=False)
+    index.refresh()
+    return index
+
+def load_similarity_index(store, path=SIMILARITY_INDEX_PATH, refresh_ratio=0.1):
+    """
+    Load the saved similarity index and bring it in line with the recipe store.
+
+    Recipes in the store but not in the index (e.g. saved by a run that stopped
+    before it saved the index) are added and recipes no longer in the store are
+    removed. Without a saved index, it is built from the whole store.
+    """
+    if not os.path.exists(path):
+        print("No saved similarity index, building it from the recipe store...")
+        return build_similarity_index(store.iter_recipes(), refresh_ratio)
+
+    index = SimilarityIndex.load(path)
+    stored_urls = set(store.find())
+    for recipe_url in set(index.documents) - stored_urls:
+        index.remove(recipe_url)
+    for recipe in store.get_many(stored_urls - set(index.documents)).values():
+        index.add(recipe)
+    return index